@@ -0,0 +1,180 @@
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from vector_store import encode_texts
+
+# Aspect topics, each anchored by a short description used as its seed embedding
+ASPECTS = {
+    "performance": "speed and performance, processor, chip, fast, slow, lag, multitasking",
+    "battery": "battery life, charging, lasts all day, battery drains quickly",
+    "display": "screen and display, brightness, colors, resolution, refresh rate",
+    "camera": "camera, photos, video recording, low light pictures, zoom",
+    "design": "design and build quality, weight, materials, looks and feels premium",
+    "price": "price and value for money, expensive, cheap, worth the cost",
+    "audio": "speakers and sound quality, microphone, audio, volume",
+    "thermals": "heat and temperature, gets hot, fan noise, overheating",
+    "software": "software and operating system, apps, updates, bugs, features",
+    "connectivity": "ports and connectivity, usb, wifi, bluetooth, cellular signal",
+    "durability": "durability and reliability, scratches, breaks, defects, repairs",
+}
+
+# Minimum cosine similarity for a review sentence to count as mentioning an aspect
+ASPECT_SIMILARITY_THRESHOLD = float(os.getenv("ASPECT_SIMILARITY_THRESHOLD", "0.35"))
+
+# Number of representative reviews kept per aspect
+ASPECT_EXAMPLES = 3
+
+_aspect_names = list(ASPECTS.keys())
+_aspect_centroids: Optional[np.ndarray] = None
+
+# product_id -> {"review_ids": set, "aspects": {aspect: stats}}
+_index: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+# product_id -> lock held while that product's reviews are being encoded
+_product_locks: Dict[str, threading.Lock] = {}
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _get_centroids() -> np.ndarray:
+    """Embed aspect seed descriptions once and reuse them."""
+    global _aspect_centroids
+    if _aspect_centroids is None:
+        _aspect_centroids = _normalize(encode_texts([ASPECTS[name] for name in _aspect_names]))
+    return _aspect_centroids
+
+def _split_sentences(text: str) -> List[str]:
+    sentences = re.split(r'(?<=[.!?])\s+|\n+', text or "")
+    return [s.strip() for s in sentences if len(s.strip()) > 3]
+
+def _parse_rating(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _new_aspect_stats() -> Dict:
+    return {
+        "mentions": 0,
+        "rating_sum": 0.0,
+        "rated": 0,
+        "high_rated": 0,  # mentions in 4-5 star reviews
+        "low_rated": 0,  # mentions in 1-2 star reviews
+        "examples": []  # (similarity, review_id, sentence), best first
+    }
+
+def update_aspect_index(product_id: str, reviews: List[dict]) -> int:
+    """
+    Add reviews to a product's aspect index.
+    Reviews already indexed (by review_id) are skipped, so this can be called
+    with the full review list whenever new reviews arrive. Reviews marked as
+    near-duplicates are not counted.
+    Concurrent calls for the same product run one at a time, so a cold
+    index is only encoded once; later callers find the reviews already
+    indexed.
+    Returns the number of newly indexed reviews.
+    """
+    with _lock:
+        product_lock = _product_locks.setdefault(product_id, threading.Lock())
+
+    with product_lock:
+        return _index_new_reviews(product_id, reviews)
+
+def _index_new_reviews(product_id: str, reviews: List[dict]) -> int:
+    with _lock:
+        entry = _index.setdefault(product_id, {"review_ids": set(), "aspects": {}})
+        seen = set(entry["review_ids"])
+
+    new_reviews = []
+    for idx, review in enumerate(reviews):
+        review_id = review.get('review_id', f"review_{idx}")
+        if review_id in seen or review.get('duplicate_of'):
+            continue
+        seen.add(review_id)
+        new_reviews.append((review_id, review))
+
+    if not new_reviews:
+        return 0
+
+    # Split every new review into sentences and embed them in one batch
+    sentences = []
+    owners = []
+    for pos, (_, review) in enumerate(new_reviews):
+        for sentence in _split_sentences(review.get('content', '')):
+            sentences.append(sentence)
+            owners.append(pos)
+
+    # review position -> aspect -> (best similarity, best sentence)
+    matches: Dict[int, Dict[str, tuple]] = {}
+    if sentences:
+        similarities = _normalize(encode_texts(sentences)) @ _get_centroids().T
+        best = similarities.argmax(axis=1)
+        for row, aspect_idx in enumerate(best):
+            score = float(similarities[row, aspect_idx])
+            if score < ASPECT_SIMILARITY_THRESHOLD:
+                continue
+            aspect = _aspect_names[aspect_idx]
+            review_matches = matches.setdefault(owners[row], {})
+            if aspect not in review_matches or score > review_matches[aspect][0]:
+                review_matches[aspect] = (score, sentences[row])
+
+    with _lock:
+        entry = _index.setdefault(product_id, {"review_ids": set(), "aspects": {}})
+        added = 0
+        for pos, (review_id, review) in enumerate(new_reviews):
+            if review_id in entry["review_ids"]:
+                continue
+            entry["review_ids"].add(review_id)
+            added += 1
+
+            rating = _parse_rating(review.get('rating'))
+            for aspect, (score, sentence) in matches.get(pos, {}).items():
+                stats = entry["aspects"].setdefault(aspect, _new_aspect_stats())
+                stats["mentions"] += 1
+                if rating is not None:
+                    stats["rating_sum"] += rating
+                    stats["rated"] += 1
+                    # Review-level star rating, not the sentiment of the matched sentence
+                    if rating >= 4:
+                        stats["high_rated"] += 1
+                    elif rating <= 2:
+                        stats["low_rated"] += 1
+                stats["examples"].append((score, review_id, sentence))
+                stats["examples"].sort(key=lambda e: e[0], reverse=True)
+                del stats["examples"][ASPECT_EXAMPLES:]
+
+    print(f"✓ Indexed aspects for product {product_id}: {added} new reviews")
+    return added
+
+def get_aspect_summary(product_id: str) -> Dict:
+    """Get per-aspect mention counts, average rating and representative reviews."""
+    with _lock:
+        entry = _index.get(product_id)
+        if not entry:
+            return {"total_reviews": 0, "aspects": []}
+
+        aspects = []
+        for aspect, stats in entry["aspects"].items():
+            aspects.append({
+                "aspect": aspect,
+                "mentions": stats["mentions"],
+                "avg_rating": round(stats["rating_sum"] / stats["rated"], 2) if stats["rated"] else None,
+                "high_rated_mentions": stats["high_rated"],
+                "low_rated_mentions": stats["low_rated"],
+                "representative_review_ids": [e[1] for e in stats["examples"]],
+                "examples": [e[2] for e in stats["examples"]]
+            })
+        total_reviews = len(entry["review_ids"])
+
+    aspects.sort(key=lambda a: a["mentions"], reverse=True)
+    return {"total_reviews": total_reviews, "aspects": aspects}
+
+def delete_aspect_index(product_id: str):
+    """Delete the aspect index for a product."""
+    with _lock:
+        _index.pop(product_id, None)
@@ -2,10 +2,32 @@ import os
 from typing import List, Optional
 from openai import OpenAI
 from vector_store import search_similar_content, get_all_reviews_summary
+from aspect_index import get_aspect_summary
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", "your-api-key-here"))
 
+def format_aspect_overview(product_id: str, max_examples: int = 0) -> str:
+    """Format the product's aspect index as compact prompt text."""
+    aspect_data = get_aspect_summary(product_id)
+    if not aspect_data['aspects']:
+        if aspect_data['total_reviews'] == 0:
+            print(f"[WARNING] No aspect index for product {product_id}, using retrieved reviews only")
+        return ""
+    
+    lines = [f"Based on {aspect_data['total_reviews']} reviews:"]
+    for aspect in aspect_data['aspects']:
+        avg_rating = aspect['avg_rating'] if aspect['avg_rating'] is not None else 'N/A'
+        lines.append(
+            f"- {aspect['aspect']}: mentioned in {aspect['mentions']} reviews "
+            f"(avg review rating {avg_rating}; {aspect['high_rated_mentions']} in 4-5★ reviews, "
+            f"{aspect['low_rated_mentions']} in 1-2★ reviews)"
+        )
+        for example in aspect['examples'][:max_examples]:
+            lines.append(f"    \"{example}\"")
+    
+    return "\n".join(lines)
+
 def generate_response(
     product_id: str,
     user_message: str,
@@ -44,6 +66,11 @@ def generate_response(
     
     context = "\n".join(context_parts)
     
+    # Aspect mention counts across all reviews, not just the retrieved ones
+    aspect_overview = format_aspect_overview(product_id)
+    if aspect_overview:
+        context = f"[Aspect Overview]\n{aspect_overview}\n\n{context}"
+    
     # Debug: Check if context is empty
     if not context.strip():
         print(f"[WARNING] Empty context for product {product_id}!")
@@ -58,7 +85,7 @@ Follow these rules:
 2. Present pros and cons mentioned in reviews in a balanced way
 3. Respond in friendly and natural language that users can easily understand
 4. If information is uncertain, don't guess - say "The reviews lack information on this aspect"
-5. Emphasize points commonly mentioned across multiple reviews
+5. Emphasize points commonly mentioned across multiple reviews (use the Aspect Overview counts when available)
 
 Product Information:
 {context}
@@ -106,10 +133,21 @@ def generate_product_summary(product_id: str) -> str:
 Product Description:
 {summary_data['description']}
 
-Reviews:
 """
     
-    for idx, review in enumerate(summary_data['reviews'][:20], 1):
+    # With an aspect index, a few sample reviews are enough alongside the counts
+    aspect_overview = format_aspect_overview(product_id, max_examples=2)
+    max_reviews = 20
+    if aspect_overview:
+        prompt += f"""
+Aspect Overview (mention counts and representative quotes):
+{aspect_overview}
+"""
+        max_reviews = 5
+    
+    prompt += "\nReviews:\n"
+    
+    for idx, review in enumerate(summary_data['reviews'][:max_reviews], 1):
         prompt += f"\nReview {idx} (Rating: {review['rating']}): {review['content']}\n"
     
     prompt += """
@@ -0,0 +1,173 @@
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+import numpy as np
+
+# MinHash / LSH settings
+# 16 bands x 8 rows puts the LSH candidate threshold around Jaccard 0.7
+NUM_PERM = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 3
+
+# Estimated Jaccard similarity above which a review is treated as a near-duplicate
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+
+# Reviews with fewer words are never marked as duplicates: short texts like
+# "Love it" are written independently by many customers
+DEDUP_MIN_WORDS = int(os.getenv("DEDUP_MIN_WORDS", "6"))
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Fixed seed so signatures stay comparable across restarts
+_rng = np.random.RandomState(1)
+_perm_a = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_perm_b = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+# product_id -> {"marks": {review_id: duplicate_of}, "signatures": {review_id: signature}, "buckets": [band tables]}
+_index: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+def _shingles(text: str) -> set:
+    """Word n-gram shingles of the normalized review text (empty below DEDUP_MIN_WORDS words)."""
+    words = re.sub(r'[^\w]+', ' ', (text or "").lower()).split()
+    if len(words) < max(DEDUP_MIN_WORDS, SHINGLE_SIZE):
+        return set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """Compute the MinHash signature of a text (None if it is too short to compare)."""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode('utf-8')) for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+    # Universal hashing (a*x + b) mod p, one column per permutation
+    permuted = ((hashes[:, None] * _perm_a + _perm_b) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+def _band_keys(signature: np.ndarray) -> List[bytes]:
+    return [signature[i * LSH_ROWS:(i + 1) * LSH_ROWS].tobytes() for i in range(LSH_BANDS)]
+
+def _new_entry() -> Dict:
+    return {
+        "marks": {},
+        "signatures": {},
+        "buckets": [{} for _ in range(LSH_BANDS)]
+    }
+
+def mark_duplicates(product_id: str, reviews: List[dict]) -> Dict:
+    """
+    Detect near-duplicate reviews and mark them in place.
+    Each duplicate gets `duplicate_of` set to the review_id of the first
+    matching review; originals get `duplicate_of = None`. Reviews shorter
+    than DEDUP_MIN_WORDS words are never marked or matched. Reviews already
+    indexed for the product (by review_id) get their stored mark written
+    back, so this can be called with the full review list whenever new
+    reviews arrive.
+    Returns dedup statistics for the newly checked reviews, including their
+    IDs in `new_review_ids` so a failed save can be undone with
+    `discard_reviews`.
+    """
+    start = time.perf_counter()
+    new_review_ids = []
+    duplicates = 0
+
+    with _lock:
+        seen = set(_index.get(product_id, _new_entry())["marks"])
+
+    # Signatures are computed outside the lock; only the LSH lookup is serialized
+    pending = []
+    for idx, review in enumerate(reviews):
+        review_id = review.get('review_id', f"review_{idx}")
+        signature = None
+        if review_id not in seen:
+            seen.add(review_id)
+            signature = minhash_signature(review.get('content', ''))
+        pending.append((review_id, review, signature))
+
+    with _lock:
+        entry = _index.setdefault(product_id, _new_entry())
+
+        for review_id, review, signature in pending:
+            if review_id in entry["marks"]:
+                review['duplicate_of'] = entry["marks"][review_id]
+                continue
+            new_review_ids.append(review_id)
+
+            if signature is None:
+                entry["marks"][review_id] = None
+                review['duplicate_of'] = None
+                continue
+
+            keys = _band_keys(signature)
+
+            # Verify LSH candidates against the estimated Jaccard similarity
+            duplicate_of = None
+            best_similarity = DEDUP_THRESHOLD
+            candidates = set()
+            for band, key in enumerate(keys):
+                candidates.update(entry["buckets"][band].get(key, ()))
+            for candidate_id in candidates:
+                similarity = float(np.mean(entry["signatures"][candidate_id] == signature))
+                if similarity >= best_similarity:
+                    duplicate_of = candidate_id
+                    best_similarity = similarity
+
+            entry["marks"][review_id] = duplicate_of
+            review['duplicate_of'] = duplicate_of
+            if duplicate_of is not None:
+                duplicates += 1
+                continue
+
+            # Only originals are indexed, so matches always point at a canonical review
+            entry["signatures"][review_id] = signature
+            for band, key in enumerate(keys):
+                entry["buckets"][band].setdefault(key, []).append(review_id)
+
+    elapsed = time.perf_counter() - start
+    checked = len(new_review_ids)
+    stats = {
+        "checked": checked,
+        "duplicates": duplicates,
+        "dedup_ratio": round(duplicates / checked, 4) if checked else 0.0,
+        "elapsed_seconds": round(elapsed, 4),
+        "new_review_ids": new_review_ids
+    }
+
+    if checked:
+        print(f"✓ Dedup for product {product_id}: {duplicates}/{checked} near-duplicates "
+              f"({stats['dedup_ratio']:.1%}) in {elapsed * 1000:.1f}ms")
+    return stats
+
+def discard_reviews(product_id: str, review_ids: List[str]):
+    """Remove reviews from the index, e.g. when saving them failed."""
+    with _lock:
+        entry = _index.get(product_id)
+        if not entry:
+            return
+
+        for review_id in review_ids:
+            entry["marks"].pop(review_id, None)
+            signature = entry["signatures"].pop(review_id, None)
+            if signature is None:
+                continue
+            for band, key in enumerate(_band_keys(signature)):
+                bucket = entry["buckets"][band].get(key)
+                if bucket and review_id in bucket:
+                    bucket.remove(review_id)
+                    if not bucket:
+                        del entry["buckets"][band][key]
+
+def delete_dedup_index(product_id: str):
+    """Delete the near-duplicate index for a product."""
+    with _lock:
+        _index.pop(product_id, None)
@@ -0,0 +1,126 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batcher for query embeddings.
+    Concurrent callers submit single texts; a background worker collects them
+    for up to `max_wait_ms` (or until `max_batch_size` is reached) and encodes
+    the whole batch in one forward pass. Identical texts that are already
+    queued or being encoded share the same result.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self._encode = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._cond = threading.Condition()
+        self._queue: List[str] = []
+        self._in_flight: Dict[str, Future] = {}
+        self._worker: Optional[threading.Thread] = None
+
+        self._stats = {"requests": 0, "coalesced": 0, "batches": 0, "encoded": 0}
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for embedding and return a future for its vector."""
+        with self._cond:
+            self._stats["requests"] += 1
+            future = self._in_flight.get(text)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future
+
+            future = Future()
+            self._in_flight[text] = future
+            self._queue.append(text)
+            self._ensure_worker()
+            self._cond.notify()
+            return future
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """
+        Embed a single text, blocking until its batch has been encoded.
+        Raises concurrent.futures.TimeoutError if that takes longer than `timeout` seconds.
+        """
+        return self.submit(text).result(timeout)
+
+    def stats(self) -> Dict:
+        """Get batching counters (requests, coalesced, batches, encoded, avg batch size)."""
+        with self._cond:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = stats["encoded"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._run,
+                name="embedding-batcher",
+                daemon=True
+            )
+            self._worker.start()
+
+    def _next_batch(self) -> List[str]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            # Give concurrent callers a short window to join this batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            taken = self._next_batch()
+            with self._cond:
+                # Drop cancelled futures; the rest can no longer be cancelled
+                batch = []
+                futures = []
+                for text in taken:
+                    future = self._in_flight[text]
+                    if future.set_running_or_notify_cancel():
+                        batch.append(text)
+                        futures.append(future)
+                    else:
+                        self._in_flight.pop(text, None)
+
+            if not batch:
+                continue
+
+            try:
+                embeddings = list(self._encode(batch))
+                if len(embeddings) != len(batch):
+                    raise ValueError(
+                        f"Encoder returned {len(embeddings)} embeddings for {len(batch)} texts"
+                    )
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future, embedding in zip(futures, embeddings):
+                    if not future.done():
+                        future.set_result(embedding)
+            finally:
+                with self._cond:
+                    for text in batch:
+                        self._in_flight.pop(text, None)
+                    self._stats["batches"] += 1
+                    self._stats["encoded"] += len(batch)
@@ -1,4 +1,5 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
@@ -57,27 +58,43 @@ def root():
 async def upload_product(product: ProductUpload):
     """Upload product information and reviews."""
     try:
+        # Mark near-duplicate reviews before storing and embedding
+        # (duplicate_of is server-set; it is not part of the Review input model)
+        from dedup import mark_duplicates, discard_reviews
+        reviews_dict = [r.dict() for r in product.reviews]
+        dedup_stats = mark_duplicates(product.product_id, reviews_dict)
+        
         # Save product to Supabase
         result = await ProductDatabase.create_product(
             product_id=product.product_id,
             name=product.name,
             description=product.description,
             image=product.image,
-            reviews=[r.dict() for r in product.reviews]
+            reviews=reviews_dict
         )
         
         if result["status"] == "error":
+            # Undo the dedup index so a retry re-checks these reviews
+            discard_reviews(product.product_id, dedup_stats["new_review_ids"])
             raise HTTPException(status_code=500, detail=result["message"])
         
         # Create vector embeddings (handled in separate function)
         from vector_store import create_embeddings
-        reviews_dict = [r.dict() for r in product.reviews]
-        create_embeddings(product.product_id, product.description, reviews_dict)
+        embed_stats = create_embeddings(product.product_id, product.description, reviews_dict)
+        
+        # Index review aspects for pros/cons answers
+        from aspect_index import update_aspect_index
+        await run_in_threadpool(update_aspect_index, product.product_id, reviews_dict)
         
         return {
             "status": "success",
             "product_id": product.product_id,
-            "reviews_count": len(product.reviews)
+            "reviews_count": len(product.reviews),
+            "dedup": {
+                "duplicates": dedup_stats["duplicates"],
+                "dedup_ratio": dedup_stats["dedup_ratio"],
+                "estimated_seconds_saved": embed_stats["estimated_seconds_saved"]
+            }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -107,6 +124,20 @@ async def list_products():
         ]
     }
 
+@app.get("/api/products/{product_id}/aspects")
+async def get_product_aspects(product_id: str):
+    """Get per-aspect review statistics for a product."""
+    product = await ProductDatabase.get_product(product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    # Index is in-memory; catch up on reviews this process hasn't indexed yet
+    from aspect_index import get_aspect_summary, update_aspect_index
+    await run_in_threadpool(update_aspect_index, product_id, product.get("reviews", []))
+    aspect_data = get_aspect_summary(product_id)
+    
+    return {"product_id": product_id, **aspect_data}
+
 @app.post("/api/chat")
 async def chat(message: ChatMessage):
     """Answer questions about the product."""
@@ -116,9 +147,16 @@ async def chat(message: ChatMessage):
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
+        # Index is in-memory; catch up on reviews this process hasn't indexed yet
+        # (e.g. after a restart or in another worker)
+        from aspect_index import update_aspect_index
+        await run_in_threadpool(update_aspect_index, message.product_id, product.get("reviews", []))
+        
         # Generate response using RAG pattern
+        # (run in a worker thread so concurrent chats can share embedding batches)
         from chat_engine import generate_response
-        response = generate_response(
+        response = await run_in_threadpool(
+            generate_response,
             message.product_id,
             message.message,
             message.conversation_history
@@ -143,6 +181,14 @@ async def delete_product(product_id: str):
     from vector_store import delete_embeddings
     delete_embeddings(product_id)
     
+    # Delete aspect index
+    from aspect_index import delete_aspect_index
+    delete_aspect_index(product_id)
+    
+    # Delete near-duplicate index
+    from dedup import delete_dedup_index
+    delete_dedup_index(product_id)
+    
     # Delete product from database
     result = await ProductDatabase.delete_product(product_id)
     if result["status"] == "error":
@@ -153,8 +199,23 @@ async def delete_product(product_id: str):
 @app.post("/api/products/{product_id}/reviews")
 async def add_review(product_id: str, review: Review):
     """Add a review to a product."""
-    result = await ProductDatabase.add_review(product_id, review.dict())
+    product = await ProductDatabase.get_product(product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    # review_id keys the dedup and aspect indexes, so it must be unique per product
+    existing_ids = {r.get("review_id") for r in product.get("reviews", [])}
+    if review.review_id in existing_ids:
+        raise HTTPException(status_code=409, detail=f"Review {review.review_id} already exists")
+    
+    # Check the new review against existing ones (index is rebuilt after a restart)
+    from dedup import mark_duplicates, discard_reviews
+    review_dict = review.dict()
+    dedup_stats = mark_duplicates(product_id, product.get("reviews", []) + [review_dict])
+    
+    result = await ProductDatabase.add_review(product_id, review_dict)
     if result["status"] == "error":
+        discard_reviews(product_id, dedup_stats["new_review_ids"])
         raise HTTPException(status_code=500, detail=result["message"])
     
     # Update vector embeddings
@@ -162,7 +223,15 @@ async def add_review(product_id: str, review: Review):
     product = await ProductDatabase.get_product(product_id)
     create_embeddings(product_id, product["description"], product.get("reviews", []))
     
-    return {"status": "success", "message": "Review added"}
+    # Only the new review is indexed; existing ones are skipped
+    from aspect_index import update_aspect_index
+    await run_in_threadpool(update_aspect_index, product_id, product.get("reviews", []))
+    
+    return {
+        "status": "success",
+        "message": "Review added",
+        "duplicate_of": review_dict["duplicate_of"]
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,10 +1,13 @@
 import os
 import json
+import time
 from typing import List
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
+from embedding_batcher import EmbeddingBatcher
 
 # Disable tokenizers parallelism warning
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -18,14 +21,46 @@ chroma_client = chromadb.Client(Settings(
 # Load embedding model (Korean language support)
 model = SentenceTransformer('jhgan/ko-sroberta-multitask')
 
+# Batch size for encoding with the SentenceTransformer model (aspect index sentences)
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "32"))
+
+# Query embedding micro-batching settings
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+QUERY_EMBED_TIMEOUT = float(os.getenv("QUERY_EMBED_TIMEOUT", "10"))
+
+def encode_texts(texts: List[str], batch_size: int = ENCODE_BATCH_SIZE) -> List[List[float]]:
+    """Encode texts with the embedding model in chunks of `batch_size`."""
+    embeddings = model.encode(texts, batch_size=max(batch_size, 1), convert_to_numpy=True)
+    return embeddings.tolist()
+
+# ChromaDB's default embedding function, shared by collections and the query batcher
+# so stored and query vectors always come from the same encoder
+embedding_function = embedding_functions.DefaultEmbeddingFunction()
+
+def encode_query_batch(texts: List[str]) -> List[List[float]]:
+    """Encode a query micro-batch with the collections' embedding function."""
+    return [np.asarray(e, dtype=np.float32).tolist() for e in embedding_function(texts)]
+
+# Concurrent search queries are coalesced and embedded together
+query_batcher = EmbeddingBatcher(
+    encode_query_batch,
+    max_batch_size=QUERY_BATCH_MAX_SIZE,
+    max_wait_ms=QUERY_BATCH_MAX_WAIT_MS
+)
+
 def get_collection(product_id: str):
     """Get or create a collection for each product."""
     collection_name = f"product_{product_id}"
     try:
-        collection = chroma_client.get_collection(name=collection_name)
+        collection = chroma_client.get_collection(
+            name=collection_name,
+            embedding_function=embedding_function
+        )
     except:
         collection = chroma_client.create_collection(
             name=collection_name,
+            embedding_function=embedding_function,
             metadata={"description": f"Reviews and description for product {product_id}"}
         )
     return collection
@@ -46,8 +81,12 @@ def create_embeddings(product_id: str, description: str, reviews: List[dict]):
     })
     ids.append(f"{product_id}_description")
     
-    # Add reviews
+    # Add reviews (near-duplicates marked at ingest are not embedded)
+    skipped_duplicates = 0
     for idx, review in enumerate(reviews):
+        if review.get('duplicate_of'):
+            skipped_duplicates += 1
+            continue
         documents.append(review.get('content', ''))
         metadatas.append({
             "type": "review",
@@ -58,15 +97,22 @@ def create_embeddings(product_id: str, description: str, reviews: List[dict]):
         ids.append(f"{product_id}_review_{idx}")
     
     # Save to ChromaDB
+    start = time.perf_counter()
     collection.add(
         documents=documents,
         metadatas=metadatas,
         ids=ids
     )
+    embed_seconds = time.perf_counter() - start
+    
+    # Estimate encoding time saved from the measured per-document cost
+    estimated_seconds_saved = embed_seconds / len(documents) * skipped_duplicates
     
     print(f"✓ Created embeddings for product {product_id}: {len(documents)} documents")
     print(f"  - Description: 1")
-    print(f"  - Reviews: {len(reviews)}")
+    print(f"  - Reviews: {len(documents) - 1}")
+    if skipped_duplicates:
+        print(f"  - Skipped duplicates: {skipped_duplicates} (~{estimated_seconds_saved:.2f}s saved)")
     
     # Verify embeddings were saved
     try:
@@ -77,14 +123,24 @@ def create_embeddings(product_id: str, description: str, reviews: List[dict]):
             print(f"  - WARNING: Verification failed - no embeddings found!")
     except Exception as e:
         print(f"  - WARNING: Could not verify embeddings: {e}")
+    
+    return {
+        "embedded": len(documents),
+        "skipped_duplicates": skipped_duplicates,
+        "embed_seconds": round(embed_seconds, 4),
+        "estimated_seconds_saved": round(estimated_seconds_saved, 4)
+    }
 
 def search_similar_content(product_id: str, query: str, top_k: int = 5):
     """Search for reviews/descriptions similar to the query."""
     try:
         collection = get_collection(product_id)
         
+        # Embed through the batcher so concurrent queries share a forward pass
+        query_embedding = query_batcher.embed(query, timeout=QUERY_EMBED_TIMEOUT)
+        
         results = collection.query(
-            query_texts=[query],
+            query_embeddings=[query_embedding],
             n_results=top_k
         )
         